@@ -2,9 +2,10 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import requests
-from textblob import TextBlob
+from textblob.sentiments import PatternAnalyzer
 import matplotlib.pyplot as plt
 import re
+import hashlib
 
 # ---------------------------------------------------------
 # PAGE SETTINGS
@@ -12,6 +13,69 @@ import re
 st.set_page_config(page_title="YouTube Comment Sentiment Analyzer", layout="wide")
 st.title("📊 YouTube Comment Sentiment Analyzer")
 
+# ---------------------------------------------------------
+# HELPERS
+# ---------------------------------------------------------
+# watch?v=, youtu.be/, /embed/ and /shorts/ links all carry an 11-char id
+VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|/embed/|/shorts/)([A-Za-z0-9_-]{11})")
+
+@st.cache_resource
+def get_sentiment_analyzer():
+    # Same scorer TextBlob(...).sentiment uses, built once instead of per comment
+    return PatternAnalyzer()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_api_get(url, params, api_key_hash, _api_key):
+    resp = requests.get(url, params={**params, "key": _api_key})
+    # Raising keeps error bodies (quota, backend errors, disabled comments) out of the cache
+    resp.raise_for_status()
+    return resp.json()
+
+def youtube_get(url, params):
+    # Cached JSON response; the cache key holds a hash of the API key, not the key
+    params = dict(params)
+    api_key = params.pop("key")
+    api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    try:
+        return _cached_api_get(url, params, api_key_hash, api_key)
+    except requests.HTTPError as e:
+        # Uncached error body, so the next click retries
+        return e.response.json()
+
+def top_k_rows(df, column, k, largest=True):
+    # O(N) partial selection, then sort only the k winners
+    values = df[column].to_numpy()
+    if largest:
+        values = -values
+    k = min(k, len(values))
+    if k == 0:
+        return df.iloc[:0]
+    idx = np.argpartition(values, k - 1)[:k]
+    return df.iloc[idx[np.argsort(values[idx], kind="stable")]]
+
+def fetch_comments(video_id, api_key, max_pages=10):
+    # commentThreads caps a page at 100; page tokens are sequential, so follow them in order
+    url = "https://www.googleapis.com/youtube/v3/commentThreads"
+    params = {
+        "part": "snippet",
+        "videoId": video_id,
+        "key": api_key,
+        "maxResults": 100,
+        "textFormat": "plainText"
+    }
+    comments = []
+    for _ in range(max_pages):
+        data = youtube_get(url, params)
+        comments.extend(
+            item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
+            for item in data.get("items", [])
+        )
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            break
+        params = {**params, "pageToken": page_token}
+    return comments
+
 # ---------------------------------------------------------
 # INPUTS
 # ---------------------------------------------------------
@@ -24,7 +88,7 @@ if st.button("Fetch & Analyze Comments"):
         st.stop()
 
     # Extract video ID
-    match = re.search(r"v=([a-zA-Z0-9_-]+)", video_url)
+    match = VIDEO_ID_RE.search(video_url)
     if not match:
         st.error("Invalid YouTube URL format.")
         st.stop()
@@ -40,8 +104,7 @@ if st.button("Fetch & Analyze Comments"):
         "key": api_key
     }
 
-    video_meta_response = requests.get(video_meta_url, params=video_meta_params)
-    video_meta = video_meta_response.json()
+    video_meta = youtube_get(video_meta_url, video_meta_params)
 
     if "items" in video_meta and len(video_meta["items"]) > 0:
         snippet = video_meta["items"][0]["snippet"]
@@ -63,22 +126,7 @@ if st.button("Fetch & Analyze Comments"):
     # ---------------------------------------------------------
     # FETCH COMMENTS
     # ---------------------------------------------------------
-    comments_url = "https://www.googleapis.com/youtube/v3/commentThreads"
-    params = {
-        "part": "snippet",
-        "videoId": video_id,
-        "key": api_key,
-        "maxResults": 100,
-        "textFormat": "plainText"
-    }
-
-    response = requests.get(comments_url, params=params)
-    data = response.json()
-
-    comments = []
-    for item in data.get("items", []):
-        comment = item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
-        comments.append(comment)
+    comments = fetch_comments(video_id, api_key)
 
     if not comments:
         st.warning("No comments found.")
@@ -89,19 +137,14 @@ if st.button("Fetch & Analyze Comments"):
     # ---------------------------------------------------------
     # SENTIMENT ANALYSIS
     # ---------------------------------------------------------
-    polarity_scores = []
-    sentiment_labels = []
-
-    for c in comments:
-        polarity = TextBlob(c).sentiment.polarity
-        polarity_scores.append(polarity)
-
-        if polarity > 0.05:
-            sentiment_labels.append("Positive")
-        elif polarity < -0.05:
-            sentiment_labels.append("Negative")
-        else:
-            sentiment_labels.append("Neutral")
+    analyzer = get_sentiment_analyzer()
+    # Score each distinct comment once, then map back to every occurrence
+    codes, unique_comments = pd.factorize(pd.Series(comments, dtype=object))
+    polarity_scores = np.array([analyzer.analyze(c).polarity for c in unique_comments], dtype=np.float32)[codes]
+    sentiment_labels = pd.Categorical(
+        np.select([polarity_scores > 0.05, polarity_scores < -0.05], ["Positive", "Negative"], default="Neutral"),
+        categories=["Positive", "Neutral", "Negative"]
+    )
 
     df = pd.DataFrame({
         "comment": comments,
@@ -121,7 +164,7 @@ if st.button("Fetch & Analyze Comments"):
     # ---------- SENTIMENT BAR CHART ----------
     with col1:
         fig1, ax1 = plt.subplots()
-        sentiment_counts = df["sentiment"].value_counts()
+        sentiment_counts = df["sentiment"].value_counts(sort=False)
         colors = {"Positive": "green", "Neutral": "gray", "Negative": "red"}
         sentiment_counts.plot(
             kind="bar",
@@ -142,9 +185,9 @@ if st.button("Fetch & Analyze Comments"):
         counts, bin_edges = np.histogram(vals, bins=bins, range=(-1, 1))
 
         bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
-        norm_centers = (bin_centers + 1) / 2
+        norm_centers = (bin_centers + 1) * 0.5
         cmap = plt.get_cmap("RdYlGn")
-        bar_colors = [cmap(n) for n in norm_centers]
+        bar_colors = cmap(norm_centers)
 
         ax2.bar(
             bin_centers,
@@ -163,8 +206,8 @@ if st.button("Fetch & Analyze Comments"):
     # TOP 10 POSITIVE & NEGATIVE TABLES
     # ---------------------------------------------------------
     st.subheader("🏆 Top Comments")
-    top_pos = df.sort_values(by="polarity", ascending=False).head(10)
-    top_neg = df.sort_values(by="polarity", ascending=True).head(10)
+    top_pos = top_k_rows(df, "polarity", 10)
+    top_neg = top_k_rows(df, "polarity", 10, largest=False)
     col3, col4 = st.columns(2)
 
     with col3:
@@ -2,9 +2,7 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 import streamlit.components.v1 as components
-import math
-import gpxpy
-import gpxpy.gpx
+import numpy as np
 import json
 
 # --------------------------------------------------
@@ -19,6 +17,7 @@ st.title("🚁 Drone Route Planner with Timeline & Speed Controls")
 st.session_state.setdefault("clicks", [])
 st.session_state.setdefault("route_ready", False)
 st.session_state.setdefault("coords", None)
+st.session_state.setdefault("coords_json", None)
 st.session_state.setdefault("distance", 0)
 st.session_state.setdefault("eta", 0)
 
@@ -26,27 +25,82 @@ st.session_state.setdefault("eta", 0)
 # Helpers
 # --------------------------------------------------
 def haversine(lat1, lon1, lat2, lon2):
+    # Works on scalars and on NumPy arrays alike
     R = 6371000
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
 def interpolate_points(start, end, steps=200):
-    lat1, lon1 = start
-    lat2, lon2 = end
-    return [(lat1 + (lat2 - lat1) * i / steps, lon1 + (lon2 - lon1) * i / steps) for i in range(steps+1)]
-
+    t = np.linspace(0, 1, steps+1)[:, None]
+    return np.asarray(start)*(1 - t) + np.asarray(end)*t
+
+GPX_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="drone-route-planner">
+<trk><trkseg>
+{points}
+</trkseg></trk>
+</gpx>
+"""
+
+@st.cache_data(show_spinner=False, ttl=24 * 3600, max_entries=64)
 def create_gpx(coords, altitude):
-    gpx = gpxpy.gpx.GPX()
-    track = gpxpy.gpx.GPXTrack()
-    gpx.tracks.append(track)
-    segment = gpxpy.gpx.GPXTrackSegment()
-    track.segments.append(segment)
-    for lat, lon in coords:
-        segment.points.append(gpxpy.gpx.GPXTrackPoint(lat, lon, elevation=altitude))
-    return gpx.to_xml()
+    points = "\n".join(
+        f'<trkpt lat="{lat:.6f}" lon="{lon:.6f}"><ele>{altitude}</ele></trkpt>'
+        for lat, lon in coords.tolist()
+    )
+    return GPX_TEMPLATE.format(points=points)
+
+# Leaflet animation page; only the coordinates and speed change between renders
+ANIMATION_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8" />
+    <link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css" />
+    <script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
+    <style>
+        #map { width: 100%; height: 500px; }
+        #timeline { width: 100%; height: 20px; background: #ddd; position: relative; margin-top: 5px; border-radius: 10px; }
+        #timeline-dot { width: 14px; height: 14px; background: red; border-radius: 50%; position: absolute; top: 3px; left: 0%; }
+    </style>
+</head>
+<body>
+    <div id="map"></div>
+    <div id="timeline"><div id="timeline-dot"></div></div>
+
+    <script>
+        var coords = __COORDS__;
+        var map = L.map('map').setView(coords[0], 14);
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', { maxZoom: 19 }).addTo(map);
+
+        var polyline = L.polyline(coords, {color: 'blue'}).addTo(map);
+        map.fitBounds(polyline.getBounds());
+
+        var droneIcon = L.circleMarker(coords[0], {
+            radius: 8, color:'red', fillColor:'red', fillOpacity:1
+        }).addTo(map);
+
+        var i = 0;
+        var interval = 50 / __SPEED__; // adjust speed multiplier
+        var timelineDot = document.getElementById('timeline-dot');
+
+        function moveDrone() {
+            if(i<coords.length){
+                droneIcon.setLatLng(coords[i]);
+                timelineDot.style.left = (i/coords.length*100) + "%";
+                i++;
+            } else {
+                clearInterval(animation);
+            }
+        }
+        var animation = setInterval(moveDrone, interval);
+    </script>
+</body>
+</html>
+"""
 
 # --------------------------------------------------
 # Controls
@@ -69,11 +123,20 @@ st.markdown("Click TWO points on the map: **Start** and **Destination**.")
 # --------------------------------------------------
 # Click Map
 # --------------------------------------------------
-click_map = folium.Map(location=[52, 5], zoom_start=6)
-for lat, lon in st.session_state.clicks:
-    folium.Marker([lat, lon]).add_to(click_map)
-
-map_data = st_folium(click_map, height=500, width=1000, key="click_map")
+# Rebuild the folium map only when the clicked points change
+click_sig = tuple(st.session_state.clicks)
+if st.session_state.get("click_map_sig") != click_sig:
+    click_map = folium.Map(location=[52, 5], zoom_start=6)
+    for lat, lon in st.session_state.clicks:
+        folium.Marker([lat, lon]).add_to(click_map)
+    st.session_state.click_map_obj = click_map
+    st.session_state.click_map_sig = click_sig
+
+# Only the click position is read back; zoom/pan/bounds changes no longer trigger reruns
+map_data = st_folium(
+    st.session_state.click_map_obj, height=500, width=1000, key="click_map",
+    returned_objects=["last_clicked"]
+)
 if map_data and map_data.get("last_clicked") and len(st.session_state.clicks)<2:
     st.session_state.clicks.append((map_data["last_clicked"]["lat"], map_data["last_clicked"]["lng"]))
 
@@ -86,6 +149,8 @@ if len(st.session_state.clicks)==2 and not st.session_state.route_ready:
     eta = distance / speed
     coords = interpolate_points(start, end)
     st.session_state.coords = coords
+    # 6 decimals is ~0.1 m; full float repr roughly doubles the payload
+    st.session_state.coords_json = json.dumps(np.round(coords, 6).tolist())
     st.session_state.distance = distance
     st.session_state.eta = eta
     st.session_state.route_ready = True
@@ -99,56 +164,11 @@ if st.session_state.route_ready:
     st.write(f"Estimated Time: **{st.session_state.eta/60:.2f} minutes**")
     st.write(f"Altitude: **{altitude} m**")
 
-    coords = st.session_state.coords
-    coords_json = json.dumps(coords)
-
-    html_code = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8" />
-        <link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css" />
-        <script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
-        <style>
-            #map {{ width: 100%; height: 500px; }}
-            #timeline {{ width: 100%; height: 20px; background: #ddd; position: relative; margin-top: 5px; border-radius: 10px; }}
-            #timeline-dot {{ width: 14px; height: 14px; background: red; border-radius: 50%; position: absolute; top: 3px; left: 0%; }}
-        </style>
-    </head>
-    <body>
-        <div id="map"></div>
-        <div id="timeline"><div id="timeline-dot"></div></div>
-
-        <script>
-            var coords = {coords_json};
-            var map = L.map('map').setView(coords[0], 14);
-            L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{ maxZoom: 19 }}).addTo(map);
-
-            var polyline = L.polyline(coords, {{color: 'blue'}}).addTo(map);
-            map.fitBounds(polyline.getBounds());
-
-            var droneIcon = L.circleMarker(coords[0], {{
-                radius: 8, color:'red', fillColor:'red', fillOpacity:1
-            }}).addTo(map);
-
-            var i = 0;
-            var interval = 50 / {speed_multiplier}; // adjust speed multiplier
-            var timelineDot = document.getElementById('timeline-dot');
-
-            function moveDrone() {{
-                if(i<coords.length){{
-                    droneIcon.setLatLng(coords[i]);
-                    timelineDot.style.left = (i/coords.length*100) + "%";
-                    i++;
-                }} else {{
-                    clearInterval(animation);
-                }}
-            }}
-            var animation = setInterval(moveDrone, interval);
-        </script>
-    </body>
-    </html>
-    """
+    html_code = (
+        ANIMATION_TEMPLATE
+        .replace("__COORDS__", st.session_state.coords_json)
+        .replace("__SPEED__", str(speed_multiplier))
+    )
     components.html(html_code, height=550)
 
     gpx_data = create_gpx(st.session_state.coords, altitude)
@@ -161,3 +181,4 @@ if st.button("Reset Mission"):
     st.session_state.clicks = []
     st.session_state.route_ready = False
     st.session_state.coords = None
+    st.session_state.coords_json = None
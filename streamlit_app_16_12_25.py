@@ -2,9 +2,12 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import requests
-from textblob import TextBlob
+from textblob.sentiments import PatternAnalyzer
 import matplotlib.pyplot as plt
 import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # ----------------------------
 # PAGE SETTINGS
@@ -12,6 +15,69 @@ import re
 st.set_page_config(page_title="YouTube Sentiment Dashboard", layout="wide")
 st.title("📊 YouTube Comment Sentiment Analyzer")
 
+# ----------------------------
+# HELPERS
+# ----------------------------
+# watch?v=, youtu.be/, /embed/ and /shorts/ links all carry an 11-char id
+VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|/embed/|/shorts/)([A-Za-z0-9_-]{11})")
+
+@st.cache_resource
+def get_sentiment_analyzer():
+    # Same scorer TextBlob(...).sentiment uses, built once instead of per comment
+    return PatternAnalyzer()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_api_get(url, params, api_key_hash, _api_key):
+    resp = requests.get(url, params={**params, "key": _api_key})
+    # Raising keeps error bodies (quota, backend errors, disabled comments) out of the cache
+    resp.raise_for_status()
+    return resp.json()
+
+def youtube_get(url, params):
+    # Cached JSON response; the cache key holds a hash of the API key, not the key
+    params = dict(params)
+    api_key = params.pop("key")
+    api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    try:
+        return _cached_api_get(url, params, api_key_hash, api_key)
+    except requests.HTTPError as e:
+        # Uncached error body, so the next click retries
+        return e.response.json()
+
+def top_k_rows(df, column, k, largest=True):
+    # O(N) partial selection, then sort only the k winners
+    values = df[column].to_numpy()
+    if largest:
+        values = -values
+    k = min(k, len(values))
+    if k == 0:
+        return df.iloc[:0]
+    idx = np.argpartition(values, k - 1)[:k]
+    return df.iloc[idx[np.argsort(values[idx], kind="stable")]]
+
+def fetch_comments(video_id, api_key, max_pages=10):
+    # commentThreads caps a page at 100; page tokens are sequential, so follow them in order
+    url = "https://www.googleapis.com/youtube/v3/commentThreads"
+    params = {
+        "part": "snippet",
+        "videoId": video_id,
+        "key": api_key,
+        "maxResults": 100,
+        "textFormat": "plainText"
+    }
+    comments = []
+    for _ in range(max_pages):
+        data = youtube_get(url, params)
+        comments.extend(
+            item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
+            for item in data.get("items", [])
+        )
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            break
+        params = {**params, "pageToken": page_token}
+    return comments
+
 # ----------------------------
 # USER INPUTS
 # ----------------------------
@@ -24,7 +90,7 @@ if st.button("Fetch & Analyze"):
         st.stop()
 
     # Extract video ID
-    match = re.search(r"v=([a-zA-Z0-9_-]+)", video_url)
+    match = VIDEO_ID_RE.search(video_url)
     if not match:
         st.error("Invalid YouTube URL format.")
         st.stop()
@@ -40,7 +106,7 @@ if st.button("Fetch & Analyze"):
         "id": video_id,
         "key": api_key
     }
-    meta_resp = requests.get(video_meta_url, params=params).json()
+    meta_resp = youtube_get(video_meta_url, params)
 
     if "items" not in meta_resp or len(meta_resp["items"]) == 0:
         st.error("Could not fetch video metadata.")
@@ -57,7 +123,7 @@ if st.button("Fetch & Analyze"):
     engagement = ((likes + comment_count) / max(views, 1)) * 100
 
     # ----------------------------
-    # FETCH CHANNEL SUBSCRIBERS
+    # FETCH CHANNEL, COMMENTS & RECENT UPLOADS (independent, so in parallel)
     # ----------------------------
     channel_url = "https://www.googleapis.com/youtube/v3/channels"
     channel_params = {
@@ -65,7 +131,26 @@ if st.button("Fetch & Analyze"):
         "id": channel_id,
         "key": api_key
     }
-    channel_resp = requests.get(channel_url, params=channel_params).json()
+    uploads_url = "https://www.googleapis.com/youtube/v3/search"
+    uploads_params = {
+        "part": "snippet",
+        "channelId": channel_id,
+        "order": "date",
+        "maxResults": 10,
+        "type": "video",
+        "key": api_key
+    }
+    # Workers get this run's script context so the cached calls inside them work as on the main thread
+    with ThreadPoolExecutor(
+        max_workers=3, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())
+    ) as executor:
+        channel_future = executor.submit(youtube_get, channel_url, channel_params)
+        comment_future = executor.submit(fetch_comments, video_id, api_key)
+        uploads_future = executor.submit(youtube_get, uploads_url, uploads_params)
+    channel_resp = channel_future.result()
+    comments = comment_future.result()
+    uploads_resp = uploads_future.result()
+
     subs = int(channel_resp["items"][0]["statistics"]["subscriberCount"])
 
     # Custom Score (example formula)
@@ -96,41 +181,21 @@ if st.button("Fetch & Analyze"):
         m6.metric("🔥 Custom Score", custom_score)
 
     # ----------------------------
-    # FETCH COMMENTS
+    # COMMENTS
     # ----------------------------
-    comment_url = "https://www.googleapis.com/youtube/v3/commentThreads"
-    params = {
-        "part": "snippet",
-        "videoId": video_id,
-        "key": api_key,
-        "maxResults": 100,
-        "textFormat": "plainText"
-    }
-
-    resp = requests.get(comment_url, params=params).json()
-    comments = [
-        item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
-        for item in resp.get("items", [])
-    ]
-
     st.success(f"Fetched {len(comments)} comments.")
 
     # ----------------------------
     # SENTIMENT ANALYSIS
     # ----------------------------
-    sentiment = []
-    polarities = []
-
-    for c in comments:
-        p = TextBlob(c).sentiment.polarity
-        polarities.append(p)
-
-        if p > 0.05:
-            sentiment.append("Positive")
-        elif p < -0.05:
-            sentiment.append("Negative")
-        else:
-            sentiment.append("Neutral")
+    analyzer = get_sentiment_analyzer()
+    # Score each distinct comment once, then map back to every occurrence
+    codes, unique_comments = pd.factorize(pd.Series(comments, dtype=object))
+    polarities = np.array([analyzer.analyze(c).polarity for c in unique_comments], dtype=np.float32)[codes]
+    sentiment = pd.Categorical(
+        np.select([polarities > 0.05, polarities < -0.05], ["Positive", "Negative"], default="Neutral"),
+        categories=["Positive", "Neutral", "Negative"]
+    )
 
     df = pd.DataFrame({
         "comment": comments,
@@ -148,7 +213,7 @@ if st.button("Fetch & Analyze"):
 
     with colA:
         fig1, ax1 = plt.subplots()
-        df["sentiment"].value_counts().plot(kind="bar", color=["green", "gray", "red"], ax=ax1)
+        df["sentiment"].value_counts(sort=False).plot(kind="bar", color=["green", "gray", "red"], ax=ax1)
         ax1.set_title("Sentiment Distribution")
         ax1.set_ylabel("Count")
         st.pyplot(fig1)
@@ -160,7 +225,7 @@ if st.button("Fetch & Analyze"):
         counts, edges = np.histogram(vals, bins=bins, range=(-1, 1))
         centers = (edges[:-1] + edges[1:]) / 2
         cmap = plt.get_cmap("RdYlGn")
-        bar_colors = [cmap((c + 1) / 2) for c in centers]
+        bar_colors = cmap((centers + 1) * 0.5)
 
         ax2.bar(centers, counts, width=(edges[1] - edges[0]) * 0.9, color=bar_colors, edgecolor="black")
         ax2.set_title("Polarity Distribution")
@@ -169,8 +234,8 @@ if st.button("Fetch & Analyze"):
     # ----------------------------
     # TOP 10 POS/NEG (without index)
     # ----------------------------
-    top_pos = df.sort_values("polarity", ascending=False).head(10).reset_index(drop=True)
-    top_neg = df.sort_values("polarity", ascending=True).head(10).reset_index(drop=True)
+    top_pos = top_k_rows(df, "polarity", 10).reset_index(drop=True)
+    top_neg = top_k_rows(df, "polarity", 10, largest=False).reset_index(drop=True)
 
     st.subheader("🏆 Top Comments")
     c1, c2 = st.columns(2)
@@ -188,17 +253,6 @@ if st.button("Fetch & Analyze"):
     # ----------------------------
     st.subheader("📺 Channel Recent Performance")
 
-    uploads_url = "https://www.googleapis.com/youtube/v3/search"
-    uploads_params = {
-        "part": "snippet",
-        "channelId": channel_id,
-        "order": "date",
-        "maxResults": 10,
-        "type": "video",
-        "key": api_key
-    }
-    uploads_resp = requests.get(uploads_url, params=uploads_params).json()
-
     vid_ids = [item["id"]["videoId"] for item in uploads_resp.get("items", [])]
 
     # Fetch their stats
@@ -208,7 +262,7 @@ if st.button("Fetch & Analyze"):
         "id": ",".join(vid_ids),
         "key": api_key
     }
-    vid_stats = requests.get(stats_url, params=stats_params).json()
+    vid_stats = youtube_get(stats_url, stats_params)
 
     recent_views = [int(v["statistics"].get("viewCount", 0)) for v in vid_stats["items"]]
 
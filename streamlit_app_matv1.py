@@ -3,76 +3,267 @@ import streamlit as st
 import osmnx as ox
 import networkx as nx
 import random
-import math
-import gpxpy
-import gpxpy.gpx
+import threading
+from itertools import islice
+from collections import OrderedDict
+import numpy as np
+import matplotlib.pyplot as plt
+from sklearn.neighbors import BallTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, connected_components
 
 # -----------------------------
 # 1️⃣ Helper: nearest node manually
 # -----------------------------
-def nearest_node_manual(G, lat, lon):
-    min_dist = float('inf')
-    nearest = None
-    for node, data in G.nodes(data=True):
-        node_lat = data['y']
-        node_lon = data['x']
-        # Haversine distance in meters
-        R = 6371000
-        phi1 = math.radians(lat)
-        phi2 = math.radians(node_lat)
-        delta_phi = math.radians(node_lat - lat)
-        delta_lambda = math.radians(node_lon - lon)
-        a = math.sin(delta_phi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(delta_lambda/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        d = R * c
-        if d < min_dist:
-            min_dist = d
-            nearest = node
-    return nearest
+def _node_index(G):
+    # Node ids plus a haversine BallTree over (lat, lon) in radians, built once per graph
+    cached = G.graph.get("_node_index")
+    if cached is None:
+        ids, coords = [], []
+        for node, data in G.nodes(data=True):
+            ids.append(node)
+            coords.append((data['y'], data['x']))
+        tree = BallTree(np.radians(coords), metric='haversine')
+        cached = (np.array(ids), tree)
+        G.graph["_node_index"] = cached
+    return cached
+
+def nearest_node_manual(G, lat, lon, within=None):
+    node_ids, tree = _node_index(G)
+    query = np.radians([[lat, lon]])
+    k = 1
+    # Widen the search until a node inside `within` (boolean mask in G.nodes order) turns up
+    while True:
+        idx = tree.query(query, k=k, return_distance=False)
+        for i in idx[0]:
+            if within is None or within[i]:
+                return node_ids[i].item()
+        if k == len(node_ids):
+            return None
+        k = min(k * 8, len(node_ids))
 
 # -----------------------------
 # 2️⃣ Helper: generate routes
 # -----------------------------
-def generate_alternative_routes(G, start, end, target_distance, tolerance, k=3):
-    routes = []
-    attempts = 0
-    max_attempts = 1000
-    nodes_list = list(G.nodes)
+def _routing_graph(G):
+    # Simple graph with the shortest parallel edge, needed by Yen's algorithm
+    H = G.graph.get("_routing")
+    if H is None:
+        H = nx.Graph()
+        H.add_nodes_from(G.nodes)
+        for u, v, d in G.edges(data=True):
+            if not H.has_edge(u, v) or d['length'] < H[u][v]['length']:
+                H.add_edge(u, v, length=d['length'])
+        G.graph["_routing"] = H
+    return H
+
+def _edge_lengths(G):
+    # (u, v) -> shortest parallel edge length, stored in both directions
+    edge_len = G.graph.get("_edge_len")
+    if edge_len is None:
+        edge_len = {}
+        for u, v, length in G.edges(data='length'):
+            if length < edge_len.get((u, v), float('inf')):
+                edge_len[(u, v)] = length
+                edge_len[(v, u)] = length
+        G.graph["_edge_len"] = edge_len
+    return edge_len
+
+def route_length(G, route):
+    edge_len = _edge_lengths(G)
+    return sum(edge_len[e] for e in zip(route[:-1], route[1:]))
+
+def _csr_graph(G):
+    # Node ids, id -> row position, and a CSR matrix of the routing graph's edge lengths
+    cached = G.graph.get("_csr")
+    if cached is None:
+        H = _routing_graph(G)
+        node_ids = list(H.nodes)
+        pos = {n: i for i, n in enumerate(node_ids)}
+        rows, cols, lengths = [], [], []
+        for u, v, length in H.edges(data='length'):
+            rows.append(pos[u])
+            cols.append(pos[v])
+            lengths.append(length)
+        csr = csr_matrix((lengths, (rows, cols)), shape=(len(node_ids), len(node_ids)))
+        cached = (np.array(node_ids), pos, csr)
+        G.graph["_csr"] = cached
+    return cached
+
+def _component_labels(G):
+    # Connected-component label per node, in G.nodes order
+    labels = G.graph.get("_components")
+    if labels is None:
+        _, labels = connected_components(_csr_graph(G)[2], directed=False)
+        G.graph["_components"] = labels
+    return labels
+
+def _component_mask(G, node):
+    # Boolean mask of the nodes that share a component with `node`
+    labels = _component_labels(G)
+    return labels == labels[_csr_graph(G)[1][node]]
+
+def _path_to(pred, i):
+    # Walk a SciPy predecessor array back to its source: [i, ..., source]
+    path = [i]
+    while pred[path[-1]] >= 0:
+        path.append(pred[path[-1]])
+    return path
 
-    while len(routes) < k and attempts < max_attempts:
-        attempts += 1
-        mid_node = random.choice(nodes_list)
+DIJKSTRA_CACHE_SIZE = 32
+
+def _dijkstra_tree(G, source, cutoff):
+    # Recent searches per graph, so re-generating from the same points skips Dijkstra.
+    # G is shared across sessions by cache_resource, hence the lock
+    cache = G.graph.setdefault("_dijkstra", OrderedDict())
+    lock = G.graph.setdefault("_dijkstra_lock", threading.Lock())
+    key = (source, cutoff)
+    with lock:
+        tree = cache.get(key)
+        if tree is not None:
+            cache.move_to_end(key)
+            return tree
+
+    _, pos, csr = _csr_graph(G)
+    # Distances past the cutoff come back as inf, predecessors as -9999
+    tree = dijkstra(csr, directed=False, indices=pos[source], limit=cutoff, return_predecessors=True)
+    with lock:
+        cache[key] = tree
+        if len(cache) > DIJKSTRA_CACHE_SIZE:
+            cache.popitem(last=False)
+    return tree
+
+def _route_edges(route):
+    # Undirected edge set of a route, for overlap checks
+    return {(u, v) if u < v else (v, u) for u, v in zip(route[:-1], route[1:])}
+
+def _is_distinct(edges, accepted, max_overlap):
+    # Reject a route whose edges are mostly shared with one already accepted
+    return all(len(edges & other) <= max_overlap * len(edges) for other in accepted)
+
+# Yen's only pays off when the direct route is already close to the target
+YEN_SLACK = 0.1
+
+def generate_alternative_routes(G, start, end, target_distance, tolerance, k=3, max_paths=30, max_overlap=0.8):
+    routes = []
+    accepted = []
 
-        try:
-            path1 = nx.shortest_path(G, start, mid_node, weight='length')
-            path2 = nx.shortest_path(G, mid_node, end, weight='length')
-            route = path1 + path2[1:]
+    # One Dijkstra from each end covers every midpoint (G is undirected).
+    # Neither leg can exceed the longest acceptable route (half of it for a loop)
+    max_length = target_distance + tolerance
+    if end == start:
+        lengths_out, pred_out = _dijkstra_tree(G, start, max_length / 2)
+        lengths_back, pred_back = lengths_out, pred_out
+    else:
+        lengths_out, pred_out = _dijkstra_tree(G, start, max_length)
+        lengths_back, pred_back = _dijkstra_tree(G, end, max_length)
+    node_ids, pos, _ = _csr_graph(G)
 
-            length = sum(G[u][v][0]['length'] for u, v in zip(route[:-1], route[1:]))
+    if start != end:
+        direct = lengths_out[pos[end]]
+        if direct > max_length:
+            # Unreachable, or even the shortest path is too long
+            return routes
 
-            if abs(length - target_distance) <= tolerance:
-                if route not in routes:
+        # Yen's k-shortest paths: simple paths come out in increasing length.
+        # Each one costs a spur search per node, so skip it when the target is far above direct
+        if direct >= target_distance - tolerance - YEN_SLACK * target_distance:
+            H = _routing_graph(G)
+            for route in islice(nx.shortest_simple_paths(H, start, end, weight='length'), max_paths):
+                length = route_length(G, route)
+                if length > max_length:
+                    break
+                if length < target_distance - tolerance:
+                    continue
+                edges = _route_edges(route)
+                if _is_distinct(edges, accepted, max_overlap):
                     routes.append(route)
-        except (nx.NetworkXNoPath, KeyError):
-            continue
+                    accepted.append(edges)
+                    if len(routes) == k:
+                        return routes
+
+    # Loops, or targets far beyond the direct distance: route via a random midpoint.
+    # Unreached nodes are inf and drop out here
+    candidates = np.flatnonzero(np.abs(lengths_out + lengths_back - target_distance) <= tolerance)
+    # Only k routes are needed, so probe a bounded random subset rather than shuffling all
+    probe = random.sample(range(len(candidates)), min(len(candidates), max(50, k * 16)))
+
+    for mid in candidates[probe].tolist():
+        if len(routes) == k:
+            break
+
+        # Paths are only rebuilt for midpoints that pass the length check
+        route = node_ids[_path_to(pred_out, mid)[::-1] + _path_to(pred_back, mid)[1:]].tolist()
+        edges = _route_edges(route)
+        if _is_distinct(edges, accepted, max_overlap):
+            routes.append(route)
+            accepted.append(edges)
 
     return routes
 
 # -----------------------------
 # 3️⃣ Helper: export GPX
 # -----------------------------
-def route_to_gpx(G, route):
-    gpx = gpxpy.gpx.GPX()
-    gpx_track = gpxpy.gpx.GPXTrack()
-    gpx.tracks.append(gpx_track)
-    gpx_segment = gpxpy.gpx.GPXTrackSegment()
-    gpx_track.segments.append(gpx_segment)
+GPX_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="trail-runner">
+<trk><trkseg>
+{points}
+</trkseg></trk>
+</gpx>
+"""
+
+@st.cache_data(show_spinner=False, ttl=24 * 3600, max_entries=64)
+def route_to_gpx(_G, place, route):
+    # _G is not hashed; the place name identifies the cached graph instead
+    nodes = _G.nodes
+    points = "\n".join(
+        f'<trkpt lat="{nodes[n]["y"]:.6f}" lon="{nodes[n]["x"]:.6f}"></trkpt>' for n in route
+    )
+    return GPX_TEMPLATE.format(points=points)
+
+# -----------------------------
+# 4️⃣ Helper: cached trail graph
+# -----------------------------
+# Ask Overpass for trail ways only, excluding areas, no-foot and private ways
+# (custom_filter replaces osmnx's walk preset, access filter included), and keep
+# just the tag the app reads
+TRAIL_FILTER = (
+    '["highway"~"^(footway|path|track)$"]["area"!~"yes"]["foot"!~"no"]'
+    '["access"!~"private"]["service"!~"private"]'
+)
+ox.settings.useful_tags_way = ["highway"]
 
-    for node in route:
-        data = G.nodes[node]
-        gpx_segment.points.append(gpxpy.gpx.GPXTrackPoint(data['y'], data['x']))
+@st.cache_resource(show_spinner=False, ttl=24 * 3600)
+def load_trail_graph(place):
+    # retain_all: disconnected trail networks are handled per start node
+    G = ox.graph_from_place(place, network_type="walk", custom_filter=TRAIL_FILTER, retain_all=True)
+    G = G.to_undirected()
 
-    return gpx.to_xml()
+    _node_index(G)
+    _routing_graph(G)
+    _edge_lengths(G)
+    _csr_graph(G)
+    _component_labels(G)
+    return G
+
+# -----------------------------
+# 5️⃣ Helper: route plot
+# -----------------------------
+ROUTE_COLORS = ["red", "blue", "green"]
+
+def plot_routes(G, routes):
+    # Route lines only; drawing the whole trail graph underneath dominated render time
+    nodes = G.nodes
+    fig, ax = plt.subplots(figsize=(6, 6))
+    for route, color in zip(routes, ROUTE_COLORS):
+        ax.plot(
+            [nodes[n]["x"] for n in route], [nodes[n]["y"] for n in route],
+            color=color, linewidth=3, alpha=0.7
+        )
+    # Keep east-west distances to scale at this latitude
+    ax.set_aspect(1 / np.cos(np.radians(nodes[routes[0][0]]["y"])))
+    ax.axis("off")
+    return fig
 
 # -----------------------------
 # Streamlit App
@@ -93,40 +284,42 @@ generate_button = st.button("Generate Routes")
 
 if generate_button:
     with st.spinner("Loading trail network..."):
-        G = ox.graph_from_place(place, network_type="walk")
-        G = G.to_undirected()
-
-        # Largest connected component
-        largest_cc_nodes = max(nx.connected_components(G), key=len)
-        G = G.subgraph(largest_cc_nodes).copy()
-
-        # Filter trails
-        trail_nodes = set()
-        for u, v, k, d in G.edges(keys=True, data=True):
-            if d.get("highway") in ["footway", "path", "track"]:
-                trail_nodes.add(u)
-                trail_nodes.add(v)
-        G = G.subgraph(trail_nodes).copy()
-
-        # Snap start/end nodes manually
+        G = load_trail_graph(place.strip())
+
+        # Snap start manually, then keep only the trails reachable from it
         start_node = nearest_node_manual(G, start_lat, start_lon)
-        end_node = nearest_node_manual(G, end_lat, end_lon)
+        end_node = nearest_node_manual(G, end_lat, end_lon, within=_component_mask(G, start_node))
 
         # Generate routes
         routes = generate_alternative_routes(G, start_node, end_node, target_distance, tolerance, k=3)
 
+    # Keep the result across reruns (e.g. clicking a download button)
+    st.session_state.trail_result = {
+        "place": place.strip(),
+        "routes": routes,
+        "lengths": [route_length(G, r) for r in routes],
+    }
+
+result = st.session_state.get("trail_result")
+if result is not None:
+    routes = result["routes"]
     if not routes:
         st.warning("No routes found. Try increasing tolerance or adjusting start/end points.")
     else:
+        # Cache hit: same graph object the routes were generated on
+        G = load_trail_graph(result["place"])
         st.success(f"{len(routes)} routes generated!")
-        for i, r in enumerate(routes):
-            length = sum(G[u][v][0]['length'] for u, v in zip(r[:-1], r[1:]))
-            st.write(f"Route {i+1}: {length/1000:.2f} km")
-            fig, ax = ox.plot_graph_route(G, r, show=False, close=False)
+        # One figure for all routes
+        if st.checkbox("Show routes on map", value=True, key="show_routes"):
+            fig = plot_routes(G, routes)
             st.pyplot(fig)
+            plt.close(fig)
+
+        for i, (r, length) in enumerate(zip(routes, result["lengths"])):
+            st.write(f"Route {i+1} ({ROUTE_COLORS[i]}): {length/1000:.2f} km")
 
             # GPX download
-            gpx_data = route_to_gpx(G, r)
+            gpx_data = route_to_gpx(G, result["place"], r)
             st.download_button(
                 label=f"Download Route {i+1} as GPX",
                 data=gpx_data,
@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from textblob import TextBlob
+from matplotlib.figure import Figure
+from textblob.sentiments import PatternAnalyzer
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 import requests
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # ----------------------------
 # PAGE CONFIG
@@ -23,6 +26,11 @@ st.write(
 # ----------------------------
 # HELPERS
 # ----------------------------
+@st.cache_resource
+def get_sentiment_analyzer():
+    # Same scorer TextBlob(...).sentiment uses, built once instead of per caption
+    return PatternAnalyzer()
+
 def get_video_id(url):
     parsed = urlparse(url)
     if parsed.hostname in ["www.youtube.com", "youtube.com"]:
@@ -32,36 +40,80 @@ def get_video_id(url):
         return parsed.path[1:]
     raise ValueError("Invalid YouTube URL")
 
-def get_raw_captions(url):
-    video_id = get_video_id(url)
+# Transcripts rarely change once published; cache them per video for a week
+@st.cache_data(ttl=7 * 24 * 3600, show_spinner=False)
+def fetch_transcript(video_id):
     api = YouTubeTranscriptApi()
     transcript = api.fetch(video_id)
-    rows = []
+    starts, durations, texts = [], [], []
     for entry in transcript:
-        rows.append({
-            "start": entry.start,
-            "duration": entry.duration,
-            "text": entry.text
-        })
-    return pd.DataFrame(rows)
+        starts.append(entry.start)
+        durations.append(entry.duration)
+        texts.append(entry.text)
+    return pd.DataFrame({
+        "start": np.asarray(starts, dtype=np.float32),
+        "duration": np.asarray(durations, dtype=np.float32),
+        "text": texts
+    })
+
+def get_raw_captions(url):
+    return fetch_transcript(get_video_id(url))
 
 def merge_captions_by_count(df, group_size=2):
-    merged = []
-    for i in range(0, len(df), group_size):
-        chunk = df.iloc[i:i + group_size]
-        merged.append({
-            "start": chunk.iloc[0]["start"],
-            "text": " ".join(chunk["text"].tolist())
-        })
-    return pd.DataFrame(merged)
+    if df.empty:
+        return pd.DataFrame()
+    # Consecutive blocks of group_size captions, merged in one groupby pass
+    groups = np.arange(len(df)) // group_size
+    return df.groupby(groups, sort=False).agg(
+        start=("start", "first"), text=("text", " ".join)
+    ).reset_index(drop=True)
 
-def get_video_metadata(video_url, api_key):
-    video_id = get_video_id(video_url)
+def top_k_rows(df, column, k, largest=True):
+    # O(N) partial selection, then sort only the k winners
+    values = df[column].to_numpy()
+    if largest:
+        values = -values
+    k = min(k, len(values))
+    if k == 0:
+        return df.iloc[:0]
+    idx = np.argpartition(values, k - 1)[:k]
+    return df.iloc[idx[np.argsort(values[idx], kind="stable")]]
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def analyze_captions(url, group_size=2):
+    # Fetch, merge and score in one cached step so re-analysing a video skips TextBlob
+    df = merge_captions_by_count(get_raw_captions(url), group_size=group_size)
+    if df.empty:
+        return df
+
+    df["time_min"] = df["start"] / 60
+    analyzer = get_sentiment_analyzer()
+    df["polarity"] = np.fromiter(
+        (analyzer.analyze(text).polarity for text in df["text"]), dtype=np.float32, count=len(df)
+    )
+    df["intensity"] = df["polarity"].abs()
+
+    polarity = df["polarity"].to_numpy()
+    conditions = [polarity > 0.05, polarity < -0.05]
+    df["sentiment"] = pd.Categorical(
+        np.select(conditions, ["Positive", "Negative"], default="Neutral"),
+        categories=["Positive", "Neutral", "Negative"]
+    )
+    df["rolling_polarity"] = df["polarity"].rolling(window=5, min_periods=1).mean()
+    df["color"] = np.select(conditions, ["green", "red"], default="gray")
+    df["polarity_diff"] = df["polarity"].diff().abs()
+    return df
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False)
+def _cached_video_metadata(video_id, api_key_hash, _api_key):
     url = "https://www.googleapis.com/youtube/v3/videos"
-    params = {"part": "snippet,statistics", "id": video_id, "key": api_key}
-    resp = requests.get(url, params=params).json()
-    if "items" not in resp or len(resp["items"]) == 0:
-        return None
+    params = {"part": "snippet,statistics", "id": video_id, "key": _api_key}
+    # Failures raise instead of returning None, so they are never cached
+    resp = requests.get(url, params=params)
+    resp.raise_for_status()
+    resp = resp.json()
+    if not resp.get("items"):
+        raise ValueError("no video found for this ID")
     snippet = resp["items"][0]["snippet"]
     stats = resp["items"][0]["statistics"]
     return {
@@ -73,6 +125,11 @@ def get_video_metadata(video_url, api_key):
         "dislikes": int(stats.get("dislikeCount", 0)) if "dislikeCount" in stats else "N/A"
     }
 
+def get_video_metadata(video_url, api_key):
+    # Cached for a day; the cache key holds a hash of the API key, not the key
+    api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    return _cached_video_metadata(get_video_id(video_url), api_key_hash, api_key)
+
 # ----------------------------
 # INPUTS
 # ----------------------------
@@ -90,15 +147,19 @@ if st.button("Analyze Video"):
         st.stop()
 
     # ----------------------------
-    # FETCH VIDEO METADATA
+    # FETCH VIDEO METADATA & CAPTIONS (independent, so in parallel)
     # ----------------------------
+    # Workers get this run's script context so the cached calls inside them work as on the main thread
+    with ThreadPoolExecutor(
+        max_workers=2, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())
+    ) as executor:
+        meta_future = executor.submit(get_video_metadata, video_url, api_key)
+        captions_future = executor.submit(analyze_captions, video_url, 2)
+
     try:
-        meta = get_video_metadata(video_url, api_key)
-        if not meta:
-            st.error("Could not fetch video metadata. Check API key or video URL.")
-            st.stop()
+        meta = meta_future.result()
     except Exception as e:
-        st.error(f"Error fetching metadata: {e}")
+        st.error(f"Could not fetch video metadata. Check API key or video URL. ({e})")
         st.stop()
 
     # Display video info at top
@@ -115,11 +176,10 @@ if st.button("Analyze Video"):
         m4.metric("👎 Dislikes", meta['dislikes'])
 
     # ----------------------------
-    # FETCH AND MERGE CAPTIONS
+    # MERGED & SCORED CAPTIONS
     # ----------------------------
     try:
-        raw_df = get_raw_captions(video_url)
-        df = merge_captions_by_count(raw_df, group_size=2)
+        df = captions_future.result()
     except Exception as e:
         st.error(f"Could not fetch captions: {e}")
         st.stop()
@@ -128,26 +188,6 @@ if st.button("Analyze Video"):
         st.error("No captions found.")
         st.stop()
 
-    # ----------------------------
-    # SENTIMENT ANALYSIS
-    # ----------------------------
-    df["time_min"] = df["start"] / 60
-    df["polarity"] = df["text"].apply(lambda x: TextBlob(x).sentiment.polarity)
-    df["intensity"] = df["polarity"].abs()
-
-    def label_sentiment(p):
-        if p > 0.05:
-            return "Positive"
-        elif p < -0.05:
-            return "Negative"
-        else:
-            return "Neutral"
-
-    df["sentiment"] = df["polarity"].apply(label_sentiment)
-    df["rolling_polarity"] = df["polarity"].rolling(window=5, min_periods=1).mean()
-    df["color"] = df["polarity"].apply(lambda p: "green" if p > 0.05 else ("red" if p < -0.05 else "gray"))
-    df["polarity_diff"] = df["polarity"].diff().abs()
-
     # ----------------------------
     # KPI CALCULATIONS
     # ----------------------------
@@ -194,9 +234,11 @@ if st.button("Analyze Video"):
     # SIDE-BY-SIDE CHARTS
     # ----------------------------
     st.subheader("📈 Sentiment Overview")
+    # Plain Figure objects are never registered with pyplot, so reruns don't accumulate them
     col1, col2 = st.columns(2)
     with col1:
-        fig1, ax1 = plt.subplots(figsize=(6, 4))
+        fig1 = Figure(figsize=(6, 4))
+        ax1 = fig1.subplots()
         ax1.scatter(df["time_min"], df["polarity"], c=df["color"], alpha=0.6)
         ax1.plot(df["time_min"], df["rolling_polarity"], color="black", linewidth=2, label="Smoothed Sentiment")
         ax1.axhline(0, linestyle="--", color="black", alpha=0.5)
@@ -207,8 +249,9 @@ if st.button("Analyze Video"):
         st.pyplot(fig1)
 
     with col2:
-        fig2, ax2 = plt.subplots(figsize=(6, 4))
-        df["sentiment"].value_counts().reindex(["Positive", "Neutral", "Negative"]).plot(
+        fig2 = Figure(figsize=(6, 4))
+        ax2 = fig2.subplots()
+        df["sentiment"].value_counts(sort=False).plot(
             kind="bar", ax=ax2, color=["green", "gray", "red"]
         )
         ax2.set_title("Sentiment Distribution")
@@ -221,14 +264,16 @@ if st.button("Analyze Video"):
     st.subheader("🔥 Sentiment Intensity & Heatmap")
     colA, colB = st.columns(2)
     with colA:
-        fig3, ax3 = plt.subplots(figsize=(6, 4))
+        fig3 = Figure(figsize=(6, 4))
+        ax3 = fig3.subplots()
         ax3.plot(df["time_min"], df["intensity"], color="purple", linewidth=2)
         ax3.set_title("Sentiment Intensity Over Time")
         ax3.set_xlabel("Time (minutes)")
         ax3.set_ylabel("Intensity (|Polarity|)")
         st.pyplot(fig3)
     with colB:
-        fig4, ax4 = plt.subplots(figsize=(6, 4))
+        fig4 = Figure(figsize=(6, 4))
+        ax4 = fig4.subplots()
         heatmap = df["polarity"].values[np.newaxis, :]
         c = ax4.imshow(heatmap, aspect="auto", cmap="RdYlGn", vmin=-1, vmax=1)
         ax4.set_title("Sentiment Heatmap")
@@ -244,10 +289,10 @@ if st.button("Analyze Video"):
     colC, colD = st.columns(2)
     with colC:
         st.write("### 🌟 Most Positive Moments")
-        st.table(df.sort_values("polarity", ascending=False).head(8)[["time_min", "polarity", "text"]].reset_index(drop=True))
+        st.table(top_k_rows(df, "polarity", 8)[["time_min", "polarity", "text"]].reset_index(drop=True))
     with colD:
         st.write("### 💀 Most Negative Moments")
-        st.table(df.sort_values("polarity").head(8)[["time_min", "polarity", "text"]].reset_index(drop=True))
+        st.table(top_k_rows(df, "polarity", 8, largest=False)[["time_min", "polarity", "text"]].reset_index(drop=True))
 
     # ----------------------------
     # DOWNLOAD CSV